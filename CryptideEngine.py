@@ -0,0 +1,1227 @@
+"""
+Cryptide solver without any GUI.
+
+solve_board is the whole pipeline as a pure function: a board spec and the placements in, 
+the candidate cells, the clues to ask and the ranked questions out.
+"""
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import permutations, islice
+
+np=None
+
+#a set of cells is stored as an int, cell k being the bit k-1 (108 bits for the whole board)
+def list2mask(l):
+    m=0
+    for k in l:
+        m|=1<<(k-1)
+    return m
+
+def mask2list(m):
+    l=[]
+    while m:
+        low=m&-m
+        l.append(low.bit_length())
+        m^=low
+    return l
+
+def popcount(m):
+    return m.bit_count()
+
+board_mask=(1<<108)-1
+
+#advanced mode: clue k+23 is 'not clue k' (k from 1 to 23), its ensemble being the complement of the one of k
+def complement(clue):
+    return clue+23 if clue<=23 else clue-23
+
+#numpy is only imported by the engines using it
+def load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        np=numpy
+    return np
+
+class Profiler():
+    """ 
+    Times the stages of a query and counts the work done in them, one JSON line per record appended to path.
+    Nothing is measured if path is None. The module profiler writes to $CRYPTIDE_PROFILE if it is set.
+    A record holds the stages and counts of its thread until it ends, a record started inside another one
+    is part of it and a stage outside any record is a record of its own, eg for a query:
+    {"event": "query", "p": 3, "clue": 11, "time": 0.01, "stages": {"solve": 0.008, ...}, "counts": {"intersections": 1234, ...}}
+    """
+    def __init__(self, path=None):
+        self.path=path
+        self.local=threading.local()
+        self.lock=threading.Lock()
+
+    @contextmanager
+    def record(self, event, **info):
+        if self.path is None or getattr(self.local, 'current', None) is not None:
+            yield
+            return
+        current=self.local.current={'event':event, **info, 'stages':{}, 'counts':{}}
+        t=time.perf_counter()
+        try:
+            yield
+        except Cancelled:
+            current['cancelled']=True
+            raise
+        finally:
+            current['time']=time.perf_counter()-t
+            self.local.current=None
+            with self.lock, open(self.path, 'a') as f:
+                f.write(json.dumps(current)+'\n')
+
+    @contextmanager
+    def stage(self, name):
+        if self.path is None:
+            yield
+            return
+        current=getattr(self.local, 'current', None)
+        if current is None:
+            with self.record(name), self.stage(name):
+                yield
+            return
+        t=time.perf_counter()
+        try:
+            yield
+        finally:
+            current['stages'][name]=current['stages'].get(name, 0)+time.perf_counter()-t
+
+    def count(self, name, n=1):
+        current=getattr(self.local, 'current', None)
+        if current is not None:
+            current['counts'][name]=current['counts'].get(name, 0)+n
+
+profiler=Profiler(os.environ.get('CRYPTIDE_PROFILE'))
+
+#numpy boolean matrix, row i is the ensemble of clue keys[i] and column k-1 the cell k
+def incidence_matrix(ens):
+    keys=np.array(list(ens.keys()))
+    rows=[np.unpackbits(np.frombuffer(m.to_bytes(14, 'little'), dtype=np.uint8), bitorder='little')[:108] for m in ens.values()]
+    return keys, np.array(rows, dtype=bool)
+
+#[(cell, share of the clue tuples of res pointing to it, level from 0 to levels-1 relative to the largest share)]
+def cell_shares(res, levels=6):
+    if not res:
+        return []
+    if load_numpy() is not None:
+        cells=np.fromiter(res.keys(), dtype=np.intp, count=len(res))
+        counts=np.fromiter(map(len, res.values()), dtype=float, count=len(res))
+        shares=counts/counts.sum()
+        level=np.minimum((counts*levels/counts.max()).astype(np.intp), levels-1)
+        return list(zip(cells.tolist(), shares.tolist(), level.tolist()))
+    counts=[len(tupl_list) for tupl_list in res.values()]
+    total, top=sum(counts), max(counts)
+    return [(cell, n/total, min(n*levels//top, levels-1)) for cell, n in zip(res, counts)]
+
+#Create Types
+types1=["lac","lac","lac","lac","forest", "forest", "swamp", "swamp", "lac", "desert", "forest", "forest", "swamp", "swamp", "desert", "desert", "desert", "forest"]
+types2=["swamp", "forest", "forest", "forest", "forest", "forest", "swamp", "swamp", "forest", "desert", "desert", "desert", "swamp", "mountain", "mountain", "mountain", "mountain", "desert"]
+types3=["swamp","swamp","forest","forest","forest","lac","swamp","swamp","forest","mountain","lac","lac","mountain","mountain","mountain","mountain","lac","lac"]
+types4=["desert", "desert","mountain","mountain","mountain","mountain","desert", "desert","mountain","lac","lac","lac","desert", "desert","desert","forest","forest","forest"]
+types5=["swamp","swamp","swamp","mountain","mountain","mountain","swamp","desert", "desert","lac","mountain","mountain","desert", "desert","lac","lac","lac","lac"]
+types6=["desert", "desert","swamp","swamp","swamp","forest","mountain","mountain","swamp","swamp","forest","forest","mountain","lac","lac","lac","lac","forest"]
+tiles_types = {1:types1, 2:types2, 3:types3, 4:types4, 5:types5, 6:types6}
+
+#Create animal territory
+ter1={18:"bear", 17:"bear", 16:"bear"}
+ter2={1:"puma", 2:"puma", 3:"puma"}
+ter3={7:"puma", 8:"puma", 13:"puma"}
+ter4={12:"puma", 18:"puma"}
+ter5={12:"bear", 17:"bear", 18:"bear"}
+ter6={1:"bear", 7:"bear"}
+tiles_ters = {1:ter1, 2:ter2, 3:ter3, 4:ter4, 5:ter5, 6:ter6}
+
+class Utils():
+
+    def who_is_reversed(self):
+        i=1
+        L=[]
+        q=int(input("how many reversed?"))
+        #q=4
+        for k in range (0,q):
+            i=int(input("who is reversed?"))
+            L.append(i)
+        #L=[4,3,1,6]
+        return L
+    #fresh copies of the tiles, reverseconfig modifies them in place
+    def base_config(self):
+        types={key:list(value) for key, value in tiles_types.items()}
+        ters={key:dict(value) for key, value in tiles_ters.items()}
+        return types, ters
+
+    def reverseconfig(self, types, ters, L=None):
+        if L is None:
+            L=self.who_is_reversed()
+        for key in types:
+            if int(key) in L:
+                types[key].reverse()
+                tmp_dic=ters[key].copy()
+                for cle in tmp_dic:
+                    new_cle = 19-int(cle)
+                    ters[key][new_cle]=ters[key][cle]
+                    del ters[key][cle]
+        return L
+    
+    #order[i] is the tile in position i, asked if not given
+    def global_positionning(self, order=None):
+        d={}
+        D={}
+        for i in range (0,6):
+            if order is None:
+                k=int(input("who is in position "+str(i)+" ?"))
+            else:
+                k=order[i]
+            d[i]=k
+            D[k]=i
+        #d={0:4, 1:3, 2:5, 3:2, 4:1, 5:6}
+        #D={1:4, 2:3, 3:1, 4:0, 5:2, 6:5}
+        return d, D
+
+    #same cells as the ones grid.setCell puts in grid.elements, without drawing anything
+    def create_gmap(self, types, ters, g1, g2, buildings=None):
+        cases={}
+        for pos, id in g1.items():
+            for inc in range(0,18):
+                cases[inc+1+18*pos]={'id':inc+1+18*pos, 'type':types[id][inc], 'ter':None, 'building':None}
+        for k, v in ters.items():
+            if k in g2:
+                for id, animal in v.items():
+                    cases[id+18*g2[k]]['ter']=animal
+        if buildings:
+            for id, obj in buildings.items():
+                cases[id]['building']=obj
+        return [cases[id] for id in sorted(cases)]
+    
+    def loc2glob(self,i,j,gi,gj,sx,sy):
+        return (i+gi*sx,j+gj*sy)
+    
+    # def building_positionning(self,objs):
+    #     u_objects={}
+    #     for obj in objs:
+    #         coord=input(str(obj)+" coordonates? (ex: 2,1 or 2,10 and None if none)")
+    #         if coord != "None":
+    #             coord=tuple(map(int, coord.split(',')))
+    #             g_idx=coord[1]+g2[coord[0]]*18
+    #             u_objects[g_idx]=obj
+    #     return u_objects
+
+class Connectivity():
+    def __init__(self):
+        self.loc_connect={1:[7,2], 2:[1,3,7,8,9], 3:[2,9,4], 4:[3,9,10,11,5], 5:[4,11,6], 6:[5,11,12], 7:[1,2,8,13], 8:[7,2,9,15,14,13], 
+                          9:[2,3,4,10,15,8], 10:[9,4,11,17,16,15], 11:[4,5,6,12,17,10], 12:[6,11,17,18], 13:[7,8,14], 14:[13,8,15], 
+                          15:[14,8,9,10,16], 16:[15,10,17], 17:[16,10,11,12,18], 18:[17,12]}
+        self.glob_ops={0:[(1,'lr'), (2, 'ud'), (3, 'tr')], 1:[(3,'ud')], 2:[(3, 'lr'), (4, 'ud'), (5, 'tr')], 3:[(5,'ud')], 4:[(5, 'lr')]}
+        self.glob_connect=self.global_connectivity(self.glob_ops, self.loc_connect)
+        self.glob_connect = dict(sorted(self.glob_connect.items()))
+
+        self.dist=self.distances()
+        self.diameter=max(max(d.values()) for d in self.dist.values())
+        self.within_masks=self.create_within_masks()
+
+    #hex distance between every pair of cells, one breadth first search per cell
+    def distances(self):
+        dist={}
+        for start in self.glob_connect:
+            d={start:0}
+            front=[start]
+            while front:
+                new_front=[]
+                for i in front:
+                    for n in self.glob_connect[i]:
+                        if n not in d:
+                            d[n]=d[i]+1
+                            new_front.append(n)
+                front=new_front
+            dist[start]=d
+        return dist
+
+    #within_masks[r][k] is the mask of the cells at distance r or less from cell k
+    def create_within_masks(self):
+        within_masks=[{} for r in range(self.diameter+1)]
+        for k, d in self.dist.items():
+            rings=[0]*(self.diameter+1)
+            for n, r in d.items():
+                rings[r]|=1<<(n-1)
+            m=0
+            for r in range(self.diameter+1):
+                m|=rings[r]
+                within_masks[r][k]=m
+        return within_masks
+
+    def within(self, cell, r):
+        return self.within_masks[min(r, self.diameter)][cell]
+
+    def global_connectivity(self,glob_ops, loc_connect):
+    
+        glob_connect=loc_connect.copy()
+        s=18
+
+        #ajout des connectivités loc en glob
+        for key, value in loc_connect.items():
+            for k in range (1,6):
+                glob_connect[key+k*s]=[]
+                for i in value:
+                    glob_connect[key+k*s].append(i+k*s)
+        
+        for key, value in glob_ops.items():
+            for tupl in value:
+                #print(tupl[1])
+                connect=self.boundary_connectivity(tupl[1])
+                #print(connect)
+                for idx, elts in connect.items():
+                    for jdx in elts:
+                        self.link(idx+key*s, jdx+tupl[0]*s, glob_connect)
+        
+        return glob_connect
+
+    def boundary_connectivity(self, string):
+        if string=='lr':
+            loc_lr_bound={6:[1,7],12:[7,13],18:[13]}
+            return loc_lr_bound
+        if string=='ud':
+            loc_ud_bound={13:[1],14:[1,2,3],15:[3],16:[3,4,5],17:[5],18:[5,6]}
+            return loc_ud_bound
+        if string=='tr':
+            loc_tr_bound={18:[1]}
+            return loc_tr_bound
+        else:
+            return "AAAAAAAAAAhsasaaaaAAAAAAH"
+    
+    def link(self,i,k,diconect):
+        if i in diconect:
+            diconect[i].append(k)
+        else:
+            diconect[i]=[]
+            diconect[i].append(k)
+
+        if k in diconect:
+            diconect[k].append(i)
+        else:
+            diconect[k]=[]
+            diconect[k].append(i)
+
+class Ensembles():
+    #advanced: the 23 negative clues are added as the keys 24 to 46, see complement
+    def __init__(self, gmap, connectivity, static=None, advanced=False):
+        #Is in field
+        type_list_0=['forest', 'desert', 'swamp', 'mountain', 'lac']
+        dico={}
+        tuple_list=[]
+        inc=0
+        for type1 in type_list_0:
+            for type2 in type_list_0:
+                if type1!=type2:
+                    tuple_list.append((type1,type2))
+                    if (type2,type1) not in tuple_list:
+                        tuple_list.append((type2,type1))
+                        inc+=1
+                        dico[inc]=[{'type':type1, 'order':0}, {'type':type2, 'order':0}]
+        #In or first neighbour
+        type_list_1=[[{'type':'forest', 'order':1}], [{'type':'desert', 'order':1}], [{'type':'swamp', 'order':1}], [{'type':'mountain', 'order':1}], [{'type':'lac', 'order':1}], 
+        [{'ter':'bear', 'order':1}, {'ter':'puma', 'order':1}]]
+        for type in type_list_1:
+            inc+=1
+            dico[inc]=type
+        #In or second neighbour
+        ['hex', 'tri', 'bear', 'puma']
+        type_list_2=[[{'building':{'shape':'hex'}, 'order':2}], [{'building':{'shape':'tri'}, 'order':2}], [{'ter': 'bear', 'order':2}], 
+                    [{'ter': 'puma', 'order':2}]]
+
+        for type in type_list_2:
+            inc+=1
+            dico[inc]=type
+        #In or third neighbour
+        type_list_3=[[{'building':{'color':'white'}, 'order':3}], [{'building':{'color':'blue'}, 'order':3}], [{'building':{'color':'green'}, 'order':3}]]
+
+        for type in type_list_3:
+            inc+=1
+            dico[inc]=type
+
+        #a negative clue has the description of its positive one, and is only derived from its ensemble
+        self.negated=[]
+        if advanced:
+            for key in range(1, inc+1):
+                dico[complement(key)]=dico[key]
+                self.negated.append(complement(key))
+
+        self.dico=dico
+        self.connectivity=connectivity
+        with profiler.stage('ensembles'):
+            self.ensembles=self.create_ensembles(gmap, connectivity, static)
+        #the building clues are then patched by add_building, version counts the changes
+        self.buildings={case['id']:case['building'] for case in gmap if case['building'] is not None}
+        self.version=0
+
+
+    #static: already known ensembles (eg from a LayoutTable), only the other ones are computed
+    def create_ensembles(self, gmap, connectivity, static=None):
+
+        ensembles_dic={}
+        for key, value in self.dico.items():
+            if key in self.negated:
+                continue
+            if static is not None and key in static:
+                ensembles_dic[key]=static[key]
+                continue
+            order=value[0]['order']
+            ensembles_dic[key]=self.subfunc(value, order, gmap, connectivity)
+        self.complement_ensembles(ensembles_dic)
+        return ensembles_dic
+
+    def complement_ensembles(self, ensembles_dic):
+        for key in self.negated:
+            ensembles_dic[key]=board_mask&~ensembles_dic[complement(key)]
+
+    #copy of the current ensembles and buildings, eg for a search running in another thread
+    def copy(self):
+        ens=Ensembles.__new__(Ensembles)
+        ens.__dict__.update(self.__dict__)
+        ens.ensembles=dict(self.ensembles)
+        ens.buildings=dict(self.buildings)
+        return ens
+
+    #clues that only depend on the tiles layout, not on the buildings
+    def static_clues(self):
+        return [key for key, value in self.dico.items() if 'building' not in value[0] and key not in self.negated]
+
+    #a new building only adds its neighbourhood to the clues it matches, a replaced one needs them recomputed
+    def add_building(self, cell, building):
+        replaced=cell in self.buildings
+        self.buildings[cell]=building
+        if replaced:
+            gmap=[{'id':id, 'type':None, 'ter':None, 'building':b} for id, b in self.buildings.items()]
+            for key, value in self.dico.items():
+                if key not in self.static_clues() and key not in self.negated:
+                    self.ensembles[key]=self.subfunc(value, value[0]['order'], gmap, self.connectivity)
+        else:
+            case={'id':cell, 'type':None, 'ter':None, 'building':building}
+            for key, value in self.dico.items():
+                if key in self.negated:
+                    continue
+                for elt in value:
+                    if 'building' in elt and self.match(elt, case):
+                        self.ensembles[key]|=self.connectivity.within(cell, elt['order'])
+        self.complement_ensembles(self.ensembles)
+        self.version+=1
+    
+    def subfunc(self, val, order, gmap, connectivity):
+        m=0
+        for elt in val:
+            for case in gmap:
+                if self.match(elt, case):
+                    m|=connectivity.within(case['id'], order)
+        return m
+
+    def match(self, elt, case):
+        if 'type' in elt:
+            return elt['type']==case['type']
+        if 'ter' in elt:
+            return elt['ter']==case['ter']
+        if case['building'] is None:
+            return False
+        for k, v in elt['building'].items():
+            if case['building'][k]!=v:
+                return False
+        return True
+
+class LayoutTable():
+    """ 
+    Terrain and animal ensembles of the 6!*2^6 tile layouts, read from a memory-mapped file written by create_layout_table.
+
+    File: b'CRYL', version (uint16), number n of clues (uint16), the n clue keys (one byte each),
+    then one record per layout of n masks of 14 bytes (little endian).
+    Layouts are sorted by permutation rank of the tile order, then by flips (bit t-1 set if tile t is reversed).
+    """
+    magic=b'CRYL'
+    version=1
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mm=mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n=struct.unpack_from('<4sHH', self.mm, 0)
+        if magic!=self.magic or version!=self.version:
+            raise ValueError(path+' is not a layout table')
+        self.clues=list(self.mm[8:8+n])
+        self.start=8+n
+        self.size=14*n
+
+    #order[i] is the tile in position i, flips the reversed tiles
+    def index(self, order, flips):
+        rank=0
+        tiles=sorted(order)
+        for t in order:
+            rank=rank*len(tiles)+tiles.index(t)
+            tiles.remove(t)
+        return rank*64+sum(1<<(t-1) for t in set(flips))
+
+    def lookup(self, order, flips):
+        start=self.start+self.index(order, flips)*self.size
+        return {clue:int.from_bytes(self.mm[start+14*i:start+14*(i+1)], 'little') for i, clue in enumerate(self.clues)}
+
+def create_layout_table(path, u, c):
+    clues=Ensembles([], c).static_clues()
+    #ensembles are unions over the cells, so a layout is the OR of its 6 placed tiles
+    parts={}
+    for tile in range(1,7):
+        for flip in (0, 1):
+            types, ters=u.base_config()
+            u.reverseconfig(types, ters, [tile] if flip else [])
+            for pos in range(0,6):
+                gmap=u.create_gmap(types, ters, {pos:tile}, {tile:pos})
+                parts[(tile, flip, pos)]=Ensembles(gmap, c).ensembles
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<4sHH', LayoutTable.magic, LayoutTable.version, len(clues))+bytes(clues))
+        for order in permutations(range(1,7)):
+            for flips in range(0,64):
+                placed=[parts[(tile, (flips>>(tile-1))&1, pos)] for pos, tile in enumerate(order)]
+                record=bytearray()
+                for clue in clues:
+                    m=0
+                    for ens in placed:
+                        m|=ens[clue]
+                    record+=m.to_bytes(14, 'little')
+                f.write(record)
+
+class Cancelled(Exception):
+    """ Raised by a progress callback to stop the search it is called from """
+
+class Solve():
+    #progress: called as progress(stage, done, total) along the search, it can raise Cancelled to stop it
+    def __init__(self, ens, p=3, clue=1, progress=None):
+        self.p=p
+        self.clue=clue
+        self.ens=ens
+        self.res={}
+        self.progress=progress
+        #number of intersections made by search
+        self.intersected=0
+    
+    def solve(self):
+        #unordered combinations of the p-1 other clues, smallest ensembles first so that branches empty out early
+        #a clue and its complement (advanced mode) are disjoint, so the empty intersection cut keeps them out of the same solution
+        others=sorted((key for key in self.ens if key!=self.clue), key=lambda key:popcount(self.ens[key]))
+        with profiler.stage('solve'):
+            self.search(self.ens[self.clue], others, 0, [], self.p-1)
+        profiler.count('intersections', self.intersected)
+
+    def report(self, stage, done, total):
+        if self.progress is not None:
+            self.progress(stage, done, total)
+
+    def search(self, intersect, others, start, t, depth):
+        if depth==0:
+            if popcount(intersect)==1:
+                self.add(intersect, list(t))
+            return
+        for i in range(start, len(others)-depth+1):
+            if depth==self.p-1:
+                self.report('solve', i, len(others)-depth+1)
+            intersect2=self.intersection(intersect, self.ens[others[i]])
+            self.intersected+=1
+            if intersect2:
+                t.append(others[i])
+                self.search(intersect2, others, i+1, t, depth-1)
+                t.pop()
+
+    #store the clue tuple t under the only cell left in mask
+    def add(self, mask, t):
+        t.sort()
+        sol=mask.bit_length()
+        if sol not in self.res:
+            self.res[sol]=[t]
+        else:
+            self.res[sol].append(t)
+
+    def intersection(self, l1, l2):
+        return l1&l2
+
+    #nice print of dico2ask
+    def nice_print(self,dico):
+        for key, el in dico.items():
+            print(key)
+            for e in el:
+                print(e)
+            print('#')
+            print('#')
+
+
+class Research(Solve):
+    def __init__(self, ens, res, imp_clues, progress=None):
+        self.progress=progress
+        self.count=self.counter(res)
+        research_dic={}
+        for key, value in self.count.items():
+            research_dic[key]=ens[key]
+        self.research_dic=research_dic
+
+        #self.adv_res, self.buffer_res=self.advanced_research(c_num=c_num)
+
+        poss_clues=self.possible_clues(imp_clues,ens)
+        dic_of_colors={}
+        for k, clue_list in poss_clues.items():
+            research_dic_color={}
+            for clue in clue_list:
+                if clue in self.count:
+                    research_dic_color[clue]=ens[clue]
+            dic_of_colors[k]=research_dic_color
+        self.dic_of_colors=dic_of_colors
+        #intersection of each sorted tuple of clues met by advanced_research
+        self.intersections={}
+
+    def advanced_research(self, research_dic, c_num):
+        """ 
+        Smallest non empty intersection of at most c_num clues of research_dic, fewest clues first.
+        Subsets are walked level by level, each one intersected from a subset of the level below:
+        a subset down to one cell is not extended any more, and a subset giving an intersection 
+        already met is dropped as it cannot lead anywhere new.
+        """
+        long=self.maxlength(research_dic)
+        pbuffer=0
+        Lbuffer=0
+        keys=sorted(research_dic)
+        level={(key,):research_dic[key] for key in keys if research_dic[key]}
+        known=len(self.intersections)
+        seen=set(level.values())
+        lattice=dict(level)
+        for n in range(1, c_num+1):
+            for t, L in level.items():
+                if popcount(L)<long:
+                    pbuffer=t
+                    Lbuffer=L
+                    long=popcount(L)
+            if long<=1 or n==c_num:
+                break
+            new_level={}
+            for t, L in level.items():
+                if popcount(L)<=1:
+                    continue
+                for key in keys:
+                    if key in t:
+                        continue
+                    t2=tuple(sorted(t+(key,)))
+                    if t2 not in self.intersections:
+                        self.intersections[t2]=self.intersection(L, research_dic[key])
+                    L2=self.intersections[t2]
+                    if L2 and L2 not in seen:
+                        seen.add(L2)
+                        new_level[t2]=L2
+            level=new_level
+            lattice.update(level)
+        buffer_res={'clues':pbuffer,'list':mask2list(Lbuffer), 'long':long}
+        profiler.count('subsets', len(lattice))
+        profiler.count('research intersections', len(self.intersections)-known)
+    
+        return lattice, buffer_res
+    def dico2ask(self,cube_percol,display=True):
+        # dico2ask={}
+        # for color in list(cube_percol.keys()):
+        #     research_dic_color=self.dic_of_colors[color]
+        #     c_num=1
+            
+        #     dico_adv, buffer = self.advanced_research(research_dic_color, c_num)
+        #     while len(buffer['list'])>1 and c_num+1<len(research_dic_color):
+        #         #print(c_num)
+        #         c_num+=1
+        #         dico_adv, buffer= self.advanced_research(research_dic_color, c_num)
+        #     dico2ask[color]=buffer
+        # print(dico2ask)
+        dico2ask={}
+        for i, color in enumerate(cube_percol):
+            research_dic_color=self.dic_of_colors[color]
+
+            while len(research_dic_color)>1:
+                self.report('dico2ask', i, len(cube_percol))
+                dico_adv, buffer = self.advanced_research(research_dic_color, len(research_dic_color))
+                if color not in dico2ask:
+                    dico2ask[color]=[buffer]
+                else:
+                    dico2ask[color].append(buffer)
+                clues2del=buffer['clues']
+                #nothing smaller than the largest clue left
+                if clues2del==0:
+                    break
+                for clue in clues2del:
+                    del research_dic_color[clue]
+                #print(len(research_dic_color))
+            if len(research_dic_color)==1:
+                if color not in dico2ask:
+                    dico2ask[color]=[{'clues':list(research_dic_color.keys())[0], 'list':mask2list(research_dic_color[list(research_dic_color.keys())[0]])}]
+                else:
+                    dico2ask[color].append({'clues':list(research_dic_color.keys())[0], 'list':mask2list(research_dic_color[list(research_dic_color.keys())[0]])})
+        if display:
+            self.nice_print(dico2ask)
+        return dico2ask
+
+    def possible_clues(self, imp_clues, ens):
+        dico={}
+        for color, clue_list in imp_clues.items():
+            clues=sorted(clue for clue in ens if clue not in clue_list)
+            if clues:
+                dico[color]=clues
+        return dico
+
+    def maxlength(self, dico):
+        if dico:
+            l=popcount(dico[list(dico.keys())[0]])
+            for k,v in dico.items():
+                if popcount(v)>l:
+                    l=popcount(v)
+        else:
+            l=0
+        return l
+    
+    def collapse(self, l,research_dic,i=0):
+        keys=list(research_dic.keys())
+        if i+1==len(keys):
+            return l
+        l=self.intersection(l, research_dic[list(research_dic.keys())[i+1]])
+        i+=1
+        if popcount(l)<=1:
+            return l
+        return self.collapse(l,research_dic,i)
+    def counter(self, res):
+        dico_compter={}
+        for key, value in res.items():
+            for t in value:
+                for clue in t:
+                    if clue in dico_compter:
+                        dico_compter[clue]+=1
+                    else:
+                        dico_compter[clue]=1
+        l=sorted(dico_compter.items(), key=lambda x:x[1], reverse=True)
+        return_dic={}
+        for elt in l:
+            return_dic[elt[0]]=elt[1]
+            
+        return return_dic
+
+class Recommender():
+    """ 
+    Ranks the questions (cell, opponent) by expected information gain.
+    The clue assignments left are the tuples of res given to the opponents in every order allowed by
+    their possible clues (players not seen yet can have any clue). An answer keeps the assignments 
+    where the opponent's clue contains the cell or those where it does not, so the gain of a question 
+    is the entropy of its answer.
+    """
+    def __init__(self, ens, res, poss_clues, opponents):
+        self.ens=ens
+        self.opponents=opponents
+        self.weights, self.total=self.count_assignments(res, poss_clues, opponents)
+
+    #weights[opponent][clue]: number of assignments giving clue to opponent
+    def count_assignments(self, res, poss_clues, opponents):
+        weights={opp:{} for opp in opponents}
+        total=0
+        visited=0
+        for tupl_list in res.values():
+            for tupl in tupl_list:
+                visited+=math.factorial(len(tupl))
+                players=(list(opponents)+[None]*len(tupl))[:len(tupl)]
+                for perm in permutations(tupl):
+                    if all(opp is None or opp not in poss_clues or clue in poss_clues[opp] for opp, clue in zip(players, perm)):
+                        total+=1
+                        for opp, clue in zip(players, perm):
+                            if opp is not None:
+                                weights[opp][clue]=weights[opp].get(clue, 0)+1
+        profiler.count('permutations', visited)
+        return weights, total
+
+    #[(gain, cell, opponent)] best first, without the cells where an opponent already put a cube or a circle
+    def rank(self, tokens={}):
+        if self.total==0 or not self.opponents:
+            return []
+        if load_numpy() is not None:
+            keys, incidence=incidence_matrix(self.ens)
+            weights=np.array([[self.weights[opp].get(clue, 0) for clue in keys.tolist()] for opp in self.opponents], dtype=float)
+            p=weights@incidence/self.total
+            with np.errstate(divide='ignore', invalid='ignore'):
+                gain=-np.nan_to_num(p*np.log2(p))-np.nan_to_num((1-p)*np.log2(1-p))
+            gain=gain.tolist()
+        else:
+            gain=[]
+            for opp in self.opponents:
+                yes=[0]*108
+                for clue, n in self.weights[opp].items():
+                    for cell in mask2list(self.ens[clue]):
+                        yes[cell-1]+=n
+                gain.append([self.entropy(y/self.total) for y in yes])
+        ranking=[]
+        for i, opp in enumerate(self.opponents):
+            for cell in range(1, 109):
+                if gain[i][cell-1]>0 and cell not in tokens.get(opp, []):
+                    ranking.append((gain[i][cell-1], cell, opp))
+        ranking.sort(key=lambda x:-x[0])
+        return ranking
+
+    def entropy(self, p):
+        if p<=0 or p>=1:
+            return 0.
+        return -p*math.log2(p)-(1-p)*math.log2(1-p)
+
+class KnowledgeBase():
+    """ 
+    Candidate clues of every player as a mask over the clues (bit k-1 for clue k), kept up to date
+    as the cubes and circles are placed instead of being rebuilt from all of them at each query.
+    A cube removes the clues containing its cell, a circle the clues missing it, and a player left
+    with a single clue holds it, so no other player can.
+    ens: Ensembles of the board, its placements are replayed if its buildings change
+    """
+    def __init__(self, ens):
+        self.ens=ens
+        #(cell, color, shape) in placing order
+        self.placements=[]
+        self.rebuild()
+
+    def rebuild(self):
+        self.version=self.ens.version
+        self.all=list2mask(self.ens.ensembles)
+        #cell_clues[cell]: clues containing cell
+        self.cell_clues=[0]*109
+        for clue, ensemble in self.ens.ensembles.items():
+            for cell in mask2list(ensemble):
+                self.cell_clues[cell]|=1<<(clue-1)
+        self.candidates={}
+        placements, self.placements=self.placements, []
+        for cell, color, shape in placements:
+            self.add(cell, color, shape)
+
+    def sync(self):
+        if self.ens.version!=self.version:
+            self.rebuild()
+
+    #copy of the current candidates, on ens (a copy of self.ens)
+    def copy(self, ens):
+        self.sync()
+        kb=KnowledgeBase.__new__(KnowledgeBase)
+        kb.__dict__.update(self.__dict__)
+        kb.ens=ens
+        kb.placements=list(self.placements)
+        kb.candidates=dict(self.candidates)
+        return kb
+
+    def add(self, cell, color, shape):
+        self.sync()
+        self.placements.append((cell, color, shape))
+        candidates=self.candidates.get(color, self.all)
+        if shape=='cube':
+            candidates&=~self.cell_clues[cell]
+        else:
+            candidates&=self.cell_clues[cell]
+        self.candidates[color]=candidates
+        self.propagate()
+
+    #until nothing changes, the clue of a player with a single candidate is removed from the others
+    def propagate(self):
+        changed=True
+        while changed:
+            changed=False
+            for color, candidates in self.candidates.items():
+                if popcount(candidates)!=1:
+                    continue
+                for other, others in self.candidates.items():
+                    if other!=color and others&candidates:
+                        self.candidates[other]=others&~candidates
+                        changed=True
+
+    #candidate masks of the p-1 opponents of your_color, the ones that placed nothing yet can have any clue
+    def opponents(self, your_color, p):
+        self.sync()
+        masks=[candidates for color, candidates in self.candidates.items() if color!=your_color][:p-1]
+        return masks+[self.all]*(p-1-len(masks))
+
+    #same dicts as Deduction.impossible_clues and Deduction.possible_clues
+    def impossible_clues(self):
+        self.sync()
+        return {color:mask2list(self.all&~candidates) for color, candidates in self.candidates.items() if self.all&~candidates}
+
+    def possible_clues(self):
+        self.sync()
+        return {color:mask2list(candidates) for color, candidates in self.candidates.items() if candidates and self.all&~candidates}
+
+class JointSolve():
+    """ 
+    Counts the whole clue assignments, one distinct clue per player, whose intersection is a single cell.
+    The players are assigned the most constrained first, and the cells reached from a partial assignment
+    are cached under (candidates of the players left, clues used, intersection so far), so the subtrees
+    that a new cube or circle leaves unchanged are not walked again by the next query.
+    ens: Ensembles of the board, the cache is cleared if its buildings change
+    """
+    def __init__(self, ens, max_cache=1<<18):
+        self.ens=ens
+        self.max_cache=max_cache
+        self.cache={}
+        self.version=ens.version
+
+    #{cell: number of assignments} for your clue and the candidate clue masks of the other players
+    #progress: called as progress('assignments', done, total) over the clues of the first player, it can raise Cancelled
+    def count(self, clue, candidates, progress=None):
+        if self.ens.version!=self.version:
+            self.cache={}
+            self.version=self.ens.version
+        candidates=tuple(sorted(candidates, key=popcount))
+        return dict(self.search(candidates, 1<<(clue-1), self.ens.ensembles[clue], progress))
+
+    #progress is only given to the top level call, the cache is shared by the threads of the GUI
+    def search(self, candidates, used, mask, progress=None):
+        if not candidates:
+            return {mask.bit_length():1} if popcount(mask)==1 else {}
+        key=(candidates, used, mask)
+        if key in self.cache:
+            return self.cache[key]
+        counts={}
+        clues=mask2list(candidates[0]&~used)
+        for i, clue in enumerate(clues):
+            if progress is not None:
+                progress('assignments', i, len(clues))
+            intersect=mask&self.ens.ensembles[clue]
+            if intersect:
+                for cell, n in self.search(candidates[1:], used|1<<(clue-1), intersect).items():
+                    counts[cell]=counts.get(cell, 0)+n
+        if len(self.cache)>=self.max_cache:
+            self.cache={}
+        self.cache[key]=counts
+        return counts
+
+class PuzzleTable():
+    """ 
+    Every set of n distinct clues of a board whose intersection is a single cell, read from a memory-mapped
+    file written by create_puzzle_table, so that the solve of a clue is a lookup.
+
+    File: b'CRYP', version (uint16), n (uint16), digest of the board ensembles (8 bytes),
+    then one record per clue set: the clues (uint64, bit k-1 for clue k, up to the 46 of advanced mode) and the cell (uint8).
+    """
+    magic=b'CRYP'
+    version=2
+    record=struct.Struct('<QB')
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mm=mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.n, self.digest=struct.unpack_from('<4sHH8s', self.mm, 0)
+        if magic!=self.magic or version!=self.version:
+            raise ValueError(path+' is not a puzzle table')
+        self.start=16
+
+    #8 bytes identifying the ensembles ens
+    @staticmethod
+    def board_digest(ens):
+        return hashlib.blake2b(b''.join(struct.pack('<B', key)+ens[key].to_bytes(14, 'little') for key in sorted(ens)), digest_size=8).digest()
+
+    def matches(self, ens):
+        return self.board_digest(ens)==self.digest
+
+    def __len__(self):
+        return (len(self.mm)-self.start)//self.record.size
+
+    #same res as Solve(ens, p=n, clue=clue).solve(): {cell:[the n-1 other clues]}
+    def lookup(self, clue):
+        bit=1<<(clue-1)
+        res={}
+        for clues, cell in self.record.iter_unpack(self.mm[self.start:]):
+            if clues&bit:
+                t=mask2list(clues&~bit)
+                if cell in res:
+                    res[cell].append(t)
+                else:
+                    res[cell]=[t]
+        return res
+
+#packed records of the clue sets whose smallest clue is first, the task of one worker
+def puzzle_chunk(ens, n, first):
+    s=Solve(ens, p=n, clue=first)
+    s.ens={key:ens[key] for key in ens if key>=first}
+    s.solve()
+    data=bytearray()
+    for cell, tupl_list in s.res.items():
+        for t in tupl_list:
+            data+=PuzzleTable.record.pack(list2mask(t)|1<<(first-1), cell)
+    return bytes(data)
+
+def create_puzzle_table(path, ens, n, workers=None):
+    """ 
+    Writes the PuzzleTable of the ensembles ens for n players. The clue sets are split by their smallest clue,
+    so each set is found by one worker only, and the records are streamed to path as the workers finish.
+    """
+    keys=sorted(ens)
+    with open(path, 'wb') as f, ProcessPoolExecutor(workers) as pool:
+        f.write(struct.pack('<4sHH8s', PuzzleTable.magic, PuzzleTable.version, n, PuzzleTable.board_digest(ens)))
+        for data in pool.map(puzzle_chunk, [ens]*len(keys), [n]*len(keys), keys):
+            f.write(data)
+
+class Deduction(Solve):
+    """ What the cubes and circles tell about the other players' clues, and the answer to a query """
+    def __init__(self):
+        self.res={}
+
+    def get_cubepos_bycolor(self, cubes):
+        dico={}
+        for k,v in cubes.items():
+            if v['color'] in dico:
+                dico[v['color']].append(k)
+            else:
+                dico[v['color']]=[k]
+        return dico
+    ###impossible clues per color
+    def impossible_clues(self, cube_percol, circle_percol, ens):
+        dico={}
+        colors=list(cube_percol)+[color for color in circle_percol if color not in cube_percol]
+        for color in colors:
+            cubes=list2mask(cube_percol.get(color, []))
+            circles=list2mask(circle_percol.get(color, []))
+            #a cube rules out every clue containing it, a circle every clue missing it
+            clue_list=[clue for clue, ensemble in ens.items() if ensemble&cubes or circles&~ensemble]
+            if clue_list:
+                dico[color]=sorted(clue_list)
+        return dico
+    ###possible clues per color
+    def possible_clues(self, imp_clues, ens):
+        dico={}
+        for color, clue_list in imp_clues.items():
+            clues=sorted(clue for clue in ens if clue not in clue_list)
+            if clues:
+                dico[color]=clues
+        return dico
+    #masks of the clues some opponent can have and, per opponent, of the clues no other opponent can have
+    #your own colour is left out: your clue is not in the tuples
+    def exclusive_masks(self, poss_clues, your_color):
+        masks={color:list2mask(clues) for color, clues in poss_clues.items() if color!=your_color}
+        holders=0
+        for m in masks.values():
+            holders|=m
+        exclusive={}
+        for color, m in masks.items():
+            others=0
+            for col, m2 in masks.items():
+                if col!=color:
+                    others|=m2
+            exclusive[color]=m&~others
+        return holders, exclusive
+
+    #a tuple is rejected if one of its clues fits no opponent or two of them fit only the same one,
+    #which only holds once every opponent has ruled out some clue (the others can have any clue)
+    def is_rejected(self, tupl, holders, exclusive):
+        if len(exclusive)<len(tupl):
+            return False
+        t=list2mask(tupl)
+        if t&~holders:
+            return True
+        for m in exclusive.values():
+            if popcount(t&m)>=2:
+                return True
+        return False
+
+    #imp_clues, poss_clues: already known (eg from a KnowledgeBase) or computed from cubes and circles
+    def correct_sol(self, res, ens, cubes, your_color, circles, imp_clues=None, poss_clues=None):
+        if poss_clues is None:
+            if imp_clues is None:
+                cube_percol=self.get_cubepos_bycolor(cubes)
+                circle_percol=self.get_cubepos_bycolor(circles)
+                imp_clues=self.impossible_clues(cube_percol, circle_percol, ens)
+            poss_clues=self.possible_clues(imp_clues, ens)
+        holders, exclusive=self.exclusive_masks(poss_clues, your_color)
+        filtered=0
+        for sol in list(res):
+            tupl_list=[tupl for tupl in res[sol] if not self.is_rejected(tupl, holders, exclusive)]
+            filtered+=len(res[sol])-len(tupl_list)
+            res[sol]=tupl_list
+            if not res[sol]:
+                del res[sol]
+        profiler.count('tuples filtered', filtered)
+        return res
+
+    #solutions of the query, the clues to ask to each colour and the questions ranked by Recommender
+    #cubes, circles: {cell:{'color':...}}, colors: every player colour, in the order opponents are taken
+    #kb: KnowledgeBase of the placed cubes and circles, they are scanned again if there is none
+    #progress: see Solve
+    #puzzles: PuzzleTable of the board, read instead of solving if it is for p players
+    def answer(self, ens, p, clue, your_color, cubes, circles, colors, kb=None, progress=None, puzzles=None, **kwargs):
+        with profiler.record('query', p=p, clue=clue, cubes=len(cubes), circles=len(circles)):
+            s=Solve(ens, p=p, clue=clue, progress=progress, **kwargs)
+            if puzzles is not None and puzzles.n==p and puzzles.matches(ens):
+                with profiler.stage('solve'):
+                    s.res=puzzles.lookup(clue)
+            else:
+                s.solve()
+            cube_percol=self.get_cubepos_bycolor(cubes)
+            circle_percol=self.get_cubepos_bycolor(circles)
+            with profiler.stage('impossible_clues'):
+                if kb is not None:
+                    imp_clues=kb.impossible_clues()
+                    poss_clues=kb.possible_clues()
+                else:
+                    imp_clues=self.impossible_clues(cube_percol, circle_percol, ens)
+                    poss_clues=self.possible_clues(imp_clues, ens)
+            if len(cubes)>=2*p:
+                with profiler.stage('correct_sol'):
+                    corr_res=self.correct_sol(s.res, ens, cubes, your_color, circles, imp_clues, poss_clues)
+            else:
+                corr_res=s.res
+
+            for cube in list(cubes.keys()):
+                if cube in corr_res:
+                    del corr_res[cube]
+
+            with profiler.stage('dico2ask'):
+                r=Research(ens, s.res, imp_clues, progress)
+                asks=r.dico2ask(cube_percol, display=False)
+
+            #opponents: the other colours that already put something
+            opponents=[color for color in colors if color!=your_color and (color in cube_percol or color in circle_percol)][:p-1]
+            tokens={color:cube_percol.get(color, [])+circle_percol.get(color, []) for color in opponents}
+            with profiler.stage('recommend'):
+                ranking=Recommender(ens, corr_res, poss_clues, opponents).rank(tokens)
+        return corr_res, asks, ranking
+
+
+player_colors=['orange', 'red', 'dark cyan', 'light blue', 'purple']
+
+#the buildings of the base game
+base_buildings=[{"shape":"tri", "color":"blue"}, {"shape":"hex", "color":"blue"}, {"shape":"tri", "color":"white"},
+                {"shape":"hex", "color":"white"}, {"shape":"tri", "color":"green"}, {"shape":"hex", "color":"green"}]
+
+#board spec (see board_ensembles) of a random tile order, random flips and the base buildings on random cells, rng: a random.Random
+def random_board(rng):
+    order=list(range(1,7))
+    rng.shuffle(order)
+    flips=[k for k in range(1,7) if rng.random()<0.5]
+    buildings=dict(zip(rng.sample(range(1,109), len(base_buildings)), base_buildings))
+    return {'order':order, 'flips':flips, 'buildings':buildings}
+
+def board_gmap(spec):
+    u=Utils()
+    types, ters=u.base_config()
+    u.reverseconfig(types, ters, spec.get('flips', []))
+    g1, g2=u.global_positionning(spec['order'])
+    buildings={int(cell):building for cell, building in spec.get('buildings', {}).items()}
+    return u.create_gmap(types, ters, g1, g2, buildings)
+
+def board_ensembles(spec, connectivity, table=None):
+    """ 
+    Ensembles of the board spec: {'order':[tile in position 0 to 5], 'flips':[reversed tiles], 'buildings':{cell:{'shape', 'color'}}}
+    and optionally 'advanced': true for the negative clues
+    """
+    static=None
+    if table is not None:
+        static=table.lookup(spec['order'], spec.get('flips', []))
+    return Ensembles(board_gmap(spec), connectivity, static=static, advanced=spec.get('advanced', False))
+
+def solve_board(spec, connectivity=None, table=None, puzzles=None):
+    """ 
+    Answer the query of spec, a board spec (see board_ensembles) with
+    'cubes', 'circles': {cell:color}, 'players': number of players, 'clue': your clue, 'color': your colour
+    and optionally 'colors', the player colours in order (player_colors by default).
+    Returns {'candidates':{cell:[clue tuples]}, 'asks':{color:[clues to ask]}, 'recommendations':[(gain, cell, color)],
+    'assignments':{cell:number of clue assignments}}
+    """
+    if connectivity is None:
+        connectivity=Connectivity()
+    cubes={int(cell):{'shape':'cube', 'color':color} for cell, color in spec.get('cubes', {}).items()}
+    circles={int(cell):{'shape':'circle', 'color':color} for cell, color in spec.get('circles', {}).items()}
+    with profiler.record('board', p=spec['players'], clue=spec['clue'], cubes=len(cubes), circles=len(circles)):
+        ens=board_ensembles(spec, connectivity, table)
+        kb=KnowledgeBase(ens)
+        for cell, token in list(cubes.items())+list(circles.items()):
+            kb.add(cell, token['color'], token['shape'])
+        candidates, asks, ranking=Deduction().answer(ens.ensembles, spec['players'], spec['clue'], spec['color'], cubes, circles, spec.get('colors', player_colors), kb=kb, puzzles=puzzles)
+        with profiler.stage('assignments'):
+            assignments=JointSolve(ens).count(spec['clue'], kb.opponents(spec['color'], spec['players']))
+    return {'candidates':candidates, 'asks':asks, 'recommendations':ranking, 'assignments':assignments}
+
+
+#game state: a board spec (see board_ensembles) with the 'cubes' and 'circles' {cell:color} of solve_board, and
+#any other key the caller needs. It is written to a temporary file first, so a crash never leaves half a state
+def save_state(path, state):
+    tmp=path+'.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+#the state saved at path with its cells back to ints, None if there is none
+def load_state(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        state=json.load(f)
+    for key in ('buildings', 'cubes', 'circles'):
+        state[key]={int(cell):v for cell, v in state.get(key, {}).items()}
+    return state
+
+class SetupIndex():
+    """ 
+    Board specs (see board_ensembles) of the setup codes, from a JSON file {code: spec} written by setups.py.
+    Codes are compared without spaces and case.
+    """
+    def __init__(self, path):
+        self.path=path
+        self.codes={}
+        if os.path.exists(path):
+            with open(path) as f:
+                for code, spec in json.load(f).items():
+                    spec['buildings']={int(cell):building for cell, building in spec['buildings'].items()}
+                    self.codes[code]=spec
+
+    def normalize(self, code):
+        return ''.join(code.split()).upper()
+
+    def decode(self, code):
+        spec=self.codes.get(self.normalize(code))
+        if spec is None:
+            raise KeyError('unknown setup code '+code)
+        return spec
+
+    def register(self, code, spec):
+        if sorted(spec['order'])!=list(range(1,7)) or not set(spec['flips'])<=set(range(1,7)):
+            raise ValueError('the order must be the tiles 1 to 6 and the flips some of them')
+        if not all(1<=int(cell)<=108 for cell in spec['buildings']):
+            raise ValueError('the buildings must be on cells 1 to 108')
+        self.codes[self.normalize(code)]={'order':list(spec['order']), 'flips':sorted(spec['flips']),
+                                          'buildings':{int(cell):building for cell, building in spec['buildings'].items()}}
+
+    def save(self):
+        save_state(self.path, self.codes)
+
+
+#state of a solve_many worker process, set once by init_worker instead of being sent with every task
+worker_state={}
+
+def init_worker(layout_path=None):
+    worker_state['connectivity']=Connectivity()
+    worker_state['table']=LayoutTable(layout_path) if layout_path else None
+    #imported here rather than by the first solve_board, which would otherwise be timed with it
+    load_numpy()
+
+def solve_chunk(specs):
+    return [solve_board(spec, worker_state['connectivity'], worker_state['table']) for spec in specs]
+
+def solve_many(specs, workers=None, chunksize=16, layout_path=None):
+    """ 
+    solve_board on every spec of the iterable specs with a pool of processes, yielding the results in input order.
+    Specs are sent by chunks of chunksize, with at most two chunks per worker waiting, so specs can be a stream.
+    """
+    workers=workers or os.cpu_count() or 1
+    specs=iter(specs)
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(layout_path,)) as pool:
+        pending=deque()
+        chunk=list(islice(specs, chunksize))
+        while chunk:
+            pending.append(pool.submit(solve_chunk, chunk))
+            if len(pending)>=2*workers:
+                yield from pending.popleft().result()
+            chunk=list(islice(specs, chunksize))
+        while pending:
+            yield from pending.popleft().result()
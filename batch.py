@@ -0,0 +1,29 @@
+"""
+Solves many game states on all cores: python batch.py [specs.jsonl] > results.jsonl
+
+Each input line is a solve_board spec (see CryptideEngine), each output line the result for the
+line of the same rank.
+"""
+import argparse
+import json
+import os
+import sys
+
+from CryptideEngine import solve_many, profiler
+
+if __name__ == "__main__":
+    parser=argparse.ArgumentParser(description='Solve the specs of a JSON lines file on a process pool')
+    parser.add_argument('specs', nargs='?', help='JSON lines file, stdin if omitted')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes, one per core by default')
+    parser.add_argument('--chunksize', type=int, default=16, help='specs sent to a worker at once')
+    parser.add_argument('--layouts', default=None, help='layout table written by layouts.py')
+    parser.add_argument('--profile', default=None, help='JSON lines file the stage timings of every spec are appended to')
+    args=parser.parse_args()
+    if args.profile:
+        #the workers read it from the environment
+        os.environ['CRYPTIDE_PROFILE']=profiler.path=args.profile
+
+    lines=open(args.specs) if args.specs else sys.stdin
+    specs=(json.loads(line) for line in lines if line.strip())
+    for result in solve_many(specs, workers=args.workers, chunksize=args.chunksize, layout_path=args.layouts):
+        print(json.dumps(result))
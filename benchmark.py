@@ -0,0 +1,125 @@
+"""
+Benchmark suite on fixed seeded boards: python benchmark.py [--save baseline.json | --baseline baseline.json]
+
+Times Connectivity, Ensembles, Solve for 3 and 4 players (also with the 46 clues of advanced mode) and
+Research.dico2ask, and reports the boards solved per second and the peak memory of a pass. With --baseline,
+exits with status 1 if a measure is worse than the stored one by more than --tolerance.
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from CryptideEngine import Connectivity, Ensembles, Solve, Research, Deduction, player_colors, random_board, board_gmap
+
+def make_gmap(seed):
+    return board_gmap(random_board(random.Random(seed)))
+
+#cubes of p players, each one given a clue and putting two cubes out of it: (your clue, {cell:{'color'}})
+def make_cubes(seed, ens, p):
+    rng=random.Random(seed)
+    clues=rng.sample(sorted(ens), p)
+    cubes={}
+    for clue, color in zip(clues, player_colors):
+        outside=[cell for cell in range(1,109) if not ens[clue]>>(cell-1)&1 and cell not in cubes]
+        for cell in rng.sample(outside, 2):
+            cubes[cell]={'shape':'cube', 'color':color}
+    return clues[0], cubes
+
+def timeit(solver, ens, p, clues):
+    t=time.perf_counter()
+    res={}
+    for clue in clues:
+        s=solver(ens, p=p, clue=clue)
+        s.solve()
+        res[clue]=s.res
+    return time.perf_counter()-t, res
+
+#one board through the whole pipeline: its ensembles, the solve of your clue and the clues to ask
+def run_board(gmap, c, seed, p, times):
+    t=time.perf_counter()
+    ens=Ensembles(gmap, c).ensembles
+    times['ensembles']+=time.perf_counter()-t
+    clue, cubes=make_cubes(seed, ens, p)
+    t=time.perf_counter()
+    s=Solve(ens, p=p, clue=clue)
+    s.solve()
+    times['solve p=%d' % p]+=time.perf_counter()-t
+    d=Deduction()
+    cube_percol=d.get_cubepos_bycolor(cubes)
+    imp_clues=d.impossible_clues(cube_percol, {}, ens)
+    t=time.perf_counter()
+    Research(ens, s.res, imp_clues).dico2ask(cube_percol, display=False)
+    times['dico2ask p=%d' % p]+=time.perf_counter()-t
+
+#{measure: value}, the times in ms per board of the best pass
+def suite(n_boards, repeat):
+    results={'connectivity ms':float('inf')}
+    for _ in range(repeat):
+        t=time.perf_counter()
+        c=Connectivity()
+        results['connectivity ms']=min(results['connectivity ms'], 1000*(time.perf_counter()-t))
+    gmaps=[make_gmap(seed) for seed in range(n_boards)]
+    #as timeit does, no garbage collection in the middle of a pass
+    gc.disable()
+    for p in (3, 4):
+        results['boards/s p=%d' % p]=0
+        for _ in range(repeat):
+            times={'ensembles':0, 'solve p=%d' % p:0, 'dico2ask p=%d' % p:0}
+            for seed, gmap in enumerate(gmaps):
+                run_board(gmap, c, seed, p, times)
+            for name, dt in times.items():
+                results[name+' ms']=min(results.get(name+' ms', float('inf')), 1000*dt/n_boards)
+            results['boards/s p=%d' % p]=max(results['boards/s p=%d' % p], n_boards/sum(times.values()))
+    advanced=[Ensembles(gmap, c, advanced=True).ensembles for gmap in gmaps]
+    for p in (3, 4):
+        clues=[make_cubes(seed, ens, p)[0] for seed, ens in enumerate(advanced)]
+        results['solve p=%d advanced ms' % p]=min(1000*sum(timeit(Solve, ens, p, [clue])[0] for ens, clue in zip(advanced, clues))/n_boards for _ in range(repeat))
+    gc.enable()
+    tracemalloc.start()
+    for seed, gmap in enumerate(gmaps):
+        run_board(gmap, c, seed, 4, {'ensembles':0, 'solve p=4':0, 'dico2ask p=4':0})
+    results['peak memory KiB']=tracemalloc.get_traced_memory()[1]/1024
+    tracemalloc.stop()
+    return results
+
+#measures worse than the baseline by more than tolerance, the throughputs being better when higher
+def regressions(results, baseline, tolerance):
+    worse=[]
+    for name, value in results.items():
+        if name not in baseline:
+            continue
+        if name.startswith('boards/s'):
+            ratio=baseline[name]/value
+        else:
+            ratio=value/baseline[name]
+        if ratio>1+tolerance:
+            worse.append((name, baseline[name], value))
+    return worse
+
+if __name__ == "__main__":
+    parser=argparse.ArgumentParser(description='Benchmark suite on fixed seeded boards')
+    parser.add_argument('--boards', type=int, default=50, help='number of seeded boards')
+    parser.add_argument('--repeat', type=int, default=10, help='passes over the boards, the best one is kept')
+    parser.add_argument('--save', default=None, help='write the measures to this baseline file')
+    parser.add_argument('--baseline', default=None, help='compare the measures to this baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown against the baseline')
+    args=parser.parse_args()
+
+    results=suite(args.boards, args.repeat)
+    baseline=json.load(open(args.baseline)) if args.baseline else {}
+    for name, value in results.items():
+        line='%-24s %10.3f' % (name, value)
+        if name in baseline:
+            line+='   baseline %10.3f' % baseline[name]
+        print(line)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1)
+    worse=regressions(results, baseline, args.tolerance)
+    for name, old, new in worse:
+        print('regression: %s %.3f -> %.3f' % (name, old, new))
+    sys.exit(1 if worse else 0)
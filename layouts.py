@@ -0,0 +1,8 @@
+"""Precomputes the terrain and animal ensembles of every tile layout: python layouts.py [layouts.bin]"""
+import sys
+
+from CryptideEngine import Utils, Connectivity, create_layout_table
+
+if __name__ == "__main__":
+    path=sys.argv[1] if len(sys.argv)>1 else 'layouts.bin'
+    create_layout_table(path, Utils(), Connectivity())
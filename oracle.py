@@ -0,0 +1,284 @@
+"""
+Differential oracle: python oracle.py [--boards 50]
+
+Random boards go through the list based Connectivity, Ensembles.subfunc, Solve and Research.collapse
+of the first version of the solver, kept here as the reference, and through the engine of CryptideEngine.
+The ensembles, the res maps and the collapsed intersections must be the same. A mismatching board is
+shrunk, by removing buildings then clues while it still mismatches, and printed as a minimal case.
+"""
+import argparse
+import random
+import sys
+
+from CryptideEngine import Connectivity, Ensembles, Solve, Research, mask2list, random_board, board_gmap
+
+class LegacyConnectivity(Connectivity):
+    """ Neighbours up to 2 and 3 steps away as sorted lists, as the reference subfunc reads them """
+    def __init__(self):
+        Connectivity.__init__(self)
+        self.glob_connect_2=self.global_connectivity2()
+        self.glob_connect_3=self.global_connectivity3()
+
+    def global_connectivity2(self):
+        glob_connect_2={}
+        for key, value in self.glob_connect.items():
+            glob_connect_2[key]=[]
+            for val in value:
+                if val not in glob_connect_2[key]:
+                    glob_connect_2[key].append(val)
+                for n in self.glob_connect[val]:
+                    if n not in glob_connect_2[key] and n!=key:
+                        glob_connect_2[key].append(n)
+            glob_connect_2[key].sort()
+        return glob_connect_2
+
+    def global_connectivity3(self):
+        glob_connect_2={}
+        for key, value in self.glob_connect.items():
+            glob_connect_2[key]=[]
+            for val in value:
+                if val not in glob_connect_2[key]:
+                    glob_connect_2[key].append(val)
+                for n in self.glob_connect[val]:
+                    if n not in glob_connect_2[key] and n!=key:
+                        glob_connect_2[key].append(n)
+                    for m in self.glob_connect[n]:
+                        if m not in glob_connect_2[key] and m!=key:
+                            glob_connect_2[key].append(m)
+            glob_connect_2[key].sort()
+        return glob_connect_2
+
+#reference Ensembles.subfunc: the list of the cells of the clue val
+def legacy_subfunc(val, order, gmap, connectivity):
+    glob_connect=connectivity.glob_connect
+    glob_connect_2=connectivity.glob_connect_2
+    glob_connect_3=connectivity.glob_connect_3
+
+    L=[]
+    if order==0:
+        for elt in val:
+            for case in gmap:
+                if elt['type']==case['type']:
+                    L.append(case['id'])
+        L.sort()
+        return L
+    if order==1:
+        for elt in val:
+            if 'type' in elt:
+                for case in gmap:
+                    if elt['type']==case['type']:
+                        if case['id'] not in L:
+                            L.append(case['id'])
+                        for id in glob_connect[case['id']]:
+                            if id not in L:
+                                L.append(id)
+            if 'ter' in elt:
+                for case in gmap:
+                    if elt['ter']==case['ter']:
+                        if case['id'] not in L:
+                            L.append(case['id'])
+                        for id in glob_connect[case['id']]:
+                            if id not in L:
+                                L.append(id)
+        L.sort()
+        return L
+    if order==2:
+        for elt in val:
+            if 'building' in elt:
+                for case in gmap:
+                    if case['building'] is not None:
+                        if elt['building']['shape']==case['building']['shape']:
+                            if case['id'] not in L:
+                                L.append(case['id'])
+                            for id in glob_connect_2[case['id']]:
+                                if id not in L:
+                                    L.append(id)
+            if 'ter' in elt:
+                for case in gmap:
+                    if elt['ter']==case['ter']:
+                        if case['id'] not in L:
+                            L.append(case['id'])
+                        for id in glob_connect_2[case['id']]:
+                            if id not in L:
+                                L.append(id)
+        L.sort()
+        return L
+    else:
+        for elt in val:
+            if 'building' in elt:
+                    for case in gmap:
+                        if case['building'] is not None:
+                            if elt['building']['color']==case['building']['color']:
+                                if case['id'] not in L:
+                                    L.append(case['id'])
+                                for id in glob_connect_3[case['id']]:
+                                    if id not in L:
+                                        L.append(id)
+        return L
+
+def legacy_intersection(l1, l2):
+    l=[]
+    for a in l1:
+        for b in l2:
+            if a==b:
+                l.append(a)
+    l.sort()
+    return l
+
+#reference Solve.solve, for 3 or 4 players, on {clue:[cells]}
+def legacy_solve(ens, p, clue):
+    res={}
+    if p==3:
+        for key, value in ens.items():
+            if ens[clue]!=value:
+                intersect=legacy_intersection(ens[clue], value)
+                for k, v in ens.items():
+                    if v!=value:
+                        intersect2=legacy_intersection(intersect, v)
+                        if len(intersect2)==1:
+                            if intersect2[0] not in res:
+                                res[intersect2[0]]=[]
+                            t=[key, k]
+                            t.sort()
+                            if t not in res[intersect2[0]]:
+                                res[intersect2[0]].append(t)
+    if p==4:
+        for key, value in ens.items():
+            if ens[clue]!=value:
+                intersect=legacy_intersection(ens[clue], value)
+                for k, v in ens.items():
+                    if v!=value:
+                        intersect2=legacy_intersection(intersect, v)
+                        for b,n in ens.items():
+                            if n!=v:
+                                intersect3=legacy_intersection(intersect2, n)
+                                if len(intersect3)==1:
+                                    if intersect3[0] not in res:
+                                        res[intersect3[0]]=[]
+                                    t=[key, k, b]
+                                    t = list(set(t))
+                                    if len(t)!=3:
+                                        continue
+                                    t.sort()
+                                    if t not in res[intersect3[0]]:
+                                        res[intersect3[0]].append(t)
+    return res
+
+#reference Research.collapse: intersection of the clues of research_dic, stopped at one cell
+def legacy_collapse(l, research_dic, i=0):
+    keys=list(research_dic.keys())
+    if i+1==len(keys):
+        return l
+    l=legacy_intersection(l, research_dic[keys[i+1]])
+    i+=1
+    if len(l)<=1:
+        return l
+    return legacy_collapse(l, research_dic, i)
+
+#the reference solve also gives tuples holding your own clue, and misses those of clues with the same cells:
+#both res are compared without them
+def normalize(res, ens, clue):
+    norm={}
+    for sol, tupl_list in res.items():
+        tupls=sorted(tuple(sorted(t)) for t in tupl_list
+                     if clue not in t and len(set(tuple(ens[c]) for c in t))==len(t))
+        if tupls:
+            norm[sol]=tupls
+    return norm
+
+class Oracle():
+    """ 
+    A case is a board with the clues kept, the clues solved for (the reference solve is slow, so only
+    a few per board) and the lists of clues collapsed.
+    """
+    def __init__(self, players, seed, queries=3):
+        self.c=Connectivity()
+        self.legacy_c=LegacyConnectivity()
+        self.players=players
+        self.queries=queries
+        self.rng=random.Random(seed)
+
+    def make_case(self):
+        board=random_board(self.rng)
+        clues=list(range(1, len(Ensembles(board_gmap(board), self.c).dico)+1))
+        queries=self.rng.sample(clues, self.queries)
+        subsets=[self.rng.sample(clues, self.rng.randint(1, 5)) for _ in range(10)]
+        return dict(board, clues=clues, queries=queries, subsets=subsets)
+
+    #(legacy {clue:[cells]}, new {clue:mask}) of the board of case, on its clues
+    def ensembles(self, case):
+        gmap=board_gmap(case)
+        new=Ensembles(gmap, self.c)
+        legacy={key:sorted(legacy_subfunc(new.dico[key], new.dico[key][0]['order'], gmap, self.legacy_c)) for key in case['clues']}
+        return legacy, {key:new.ensembles[key] for key in case['clues']}
+
+    #first difference found on case, None if there is none
+    def check(self, case):
+        legacy, new=self.ensembles(case)
+        for key in legacy:
+            if legacy[key]!=mask2list(new[key]):
+                return ('ensemble', key, legacy[key], mask2list(new[key]))
+        for p in self.players:
+            if p>len(legacy):
+                continue
+            for clue in case['queries']:
+                s=Solve(new, p=p, clue=clue)
+                s.solve()
+                expected=normalize(legacy_solve(legacy, p, clue), legacy, clue)
+                got=normalize(s.res, legacy, clue)
+                if expected!=got:
+                    return ('solve', p, clue, expected, got)
+        r=Research.__new__(Research)
+        for keys in case['subsets']:
+            expected=legacy_collapse(legacy[keys[0]], {key:legacy[key] for key in keys})
+            got=mask2list(r.collapse(new[keys[0]], {key:new[key] for key in keys}))
+            if expected!=got:
+                return ('collapse', keys, expected, got)
+        return None
+
+    #case without the clue, None if it has nothing left to check
+    def without_clue(self, case, clue):
+        clues=[c for c in case['clues'] if c!=clue]
+        queries=[c for c in case['queries'] if c!=clue]
+        subsets=[keys for keys in ([c for c in keys if c!=clue] for keys in case['subsets']) if keys]
+        if not clues or not (queries or subsets):
+            return None
+        return dict(case, clues=clues, queries=queries, subsets=subsets)
+
+    #removes the buildings then the clues of a mismatching case as long as it still mismatches
+    def shrink(self, case):
+        for cell in list(case['buildings']):
+            smaller=dict(case, buildings={k:v for k, v in case['buildings'].items() if k!=cell})
+            if self.check(smaller):
+                case=smaller
+        for clue in list(case['clues']):
+            smaller=self.without_clue(case, clue)
+            if smaller is not None and self.check(smaller):
+                case=smaller
+        return case
+
+    def run(self, n_boards):
+        failures=0
+        for i in range(n_boards):
+            case=self.make_case()
+            if self.check(case) is None:
+                continue
+            failures+=1
+            case=self.shrink(case)
+            print('board %d mismatches, minimal case:' % i)
+            print('  order %s flips %s buildings %s' % (case['order'], case['flips'], case['buildings']))
+            print('  clues %s queries %s subsets %s' % (case['clues'], case['queries'], case['subsets']))
+            print('  %s' % (self.check(case),))
+        return failures
+
+if __name__ == "__main__":
+    parser=argparse.ArgumentParser(description='Compare the engine of CryptideEngine with the reference solver on random boards')
+    parser.add_argument('--boards', type=int, default=50, help='number of random boards')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the boards')
+    parser.add_argument('--players', type=int, nargs='+', choices=[3, 4], default=[3, 4], help='numbers of players solved for, the reference solve only handles 3 and 4')
+    parser.add_argument('--queries', type=int, default=3, help='clues solved for on each board')
+    args=parser.parse_args()
+
+    failures=Oracle(args.players, args.seed, args.queries).run(args.boards)
+    print('%d boards, %d mismatching' % (args.boards, failures))
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,34 @@
+"""
+Precomputes the solutions of a board: python puzzles.py N [state.json | --code CODE] [--output puzzles.bin]
+
+Every set of N distinct clues of the board (a saved game, cryptide_state.json by default, or a setup code of
+setups.json) whose intersection is a single cell is written to the output by parallel workers, each set once.
+When puzzles.bin is next to CyptideGUI.py, the solve of a query for N players on that board is then a lookup
+of the sets holding your clue.
+"""
+import argparse
+import os
+import time
+
+from CryptideEngine import Connectivity, PuzzleTable, SetupIndex, board_ensembles, create_puzzle_table, load_state
+
+here=os.path.dirname(os.path.abspath(__file__))
+
+if __name__ == "__main__":
+    parser=argparse.ArgumentParser(description='Write every clue set of a board pointing to a single cell')
+    parser.add_argument('players', type=int, help='number of players, the size of the clue sets')
+    parser.add_argument('state', nargs='?', default=os.path.join(here, 'cryptide_state.json'), help='saved game whose board is used')
+    parser.add_argument('--code', default=None, help='setup code of setups.json used instead of the saved game')
+    parser.add_argument('--output', default=os.path.join(here, 'puzzles.bin'), help='table file')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes, one per core by default')
+    args=parser.parse_args()
+
+    spec=SetupIndex(os.path.join(here, 'setups.json')).decode(args.code) if args.code else load_state(args.state)
+    if spec is None:
+        parser.error('no saved game in '+args.state)
+    ens=board_ensembles(spec, Connectivity()).ensembles
+    if not 2<=args.players<=len(ens):
+        parser.error('the sets need 2 to %d players' % len(ens))
+    t=time.perf_counter()
+    create_puzzle_table(args.output, ens, args.players, args.workers)
+    print('%d clue sets written to %s in %.1f s' % (len(PuzzleTable(args.output)), args.output, time.perf_counter()-t))
@@ -0,0 +1,42 @@
+"""
+Index of the setup codes read by CyptideGUI.py --code: python setups.py add CODE [state.json] | show CODE | list
+
+add registers the board (tile order, flips and buildings) of a saved game, cryptide_state.json by default,
+under CODE, so that the same setup can then be started from its code without any question or click.
+"""
+import argparse
+import os
+import sys
+
+from CryptideEngine import SetupIndex, load_state
+
+index_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'setups.json')
+
+if __name__ == "__main__":
+    parser=argparse.ArgumentParser(description='Register and look up setup codes')
+    parser.add_argument('command', choices=['add', 'show', 'list'])
+    parser.add_argument('code', nargs='?', help='setup code')
+    parser.add_argument('state', nargs='?', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cryptide_state.json'),
+                        help='saved game whose board is registered by add')
+    parser.add_argument('--index', default=index_path, help='index file')
+    args=parser.parse_args()
+
+    index=SetupIndex(args.index)
+    if args.command=='list':
+        for code, spec in sorted(index.codes.items()):
+            print(code, spec['order'], spec['flips'], len(spec['buildings']), 'buildings')
+        sys.exit(0)
+    if args.code is None:
+        parser.error('a code is needed')
+    if args.command=='show':
+        try:
+            print(index.decode(args.code))
+        except KeyError as exc:
+            parser.error(exc.args[0])
+    else:
+        state=load_state(args.state)
+        if state is None:
+            parser.error('no saved game in '+args.state)
+        index.register(args.code, state)
+        index.save()
+        print(index.normalize(args.code), index.decode(args.code))
@@ -0,0 +1,101 @@
+"""
+Self-play: python simulate.py [--games 100] [--players 3] [--workers 4]
+
+Bots play whole games on seeded boards. Each bot is given its clue of a random assignment pointing to a
+single cell and puts its two first cubes out of it. At its turn, a bot searches the cell if solve_board
+leaves only one (a wrong search ends with a cube of the first opponent saying no), or else asks the
+question ranked first by solve_board. The asked bot answers with a circle or a cube from its clue, and a
+bot answered with a cube puts another cube out of its own clue. Reported: the turns to win and the time
+solve_board takes at each turn of the game.
+"""
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from CryptideEngine import Solve, board_ensembles, random_board, solve_board, init_worker, worker_state, player_colors
+
+#seeded board and clues of the p players: {'order', 'flips', 'buildings', 'clues':{color:clue}, 'cell'}
+def make_game(rng, p, connectivity):
+    while True:
+        board=random_board(rng)
+        ens=board_ensembles(board, connectivity).ensembles
+        s=Solve(ens, p=p, clue=rng.choice(sorted(ens)))
+        s.solve()
+        if s.res:
+            break
+    cell=rng.choice(sorted(s.res))
+    clues=[s.clue]+rng.choice(s.res[cell])
+    rng.shuffle(clues)
+    return dict(board, clues=dict(zip(player_colors, clues)), cell=cell, ens=ens)
+
+#a cube of color on a free cell out of its clue
+def put_cube(rng, game, tokens, color):
+    ens=game['ens'][game['clues'][color]]
+    free=[cell for cell in range(1,109) if cell not in tokens['cubes'] and cell not in tokens['circles'] and not ens>>(cell-1)&1]
+    tokens['cubes'][rng.choice(free)]=color
+
+def play(seed, p, max_turns=60):
+    rng=random.Random(seed)
+    game=make_game(rng, p, worker_state['connectivity'])
+    colors=player_colors[:p]
+    tokens={'cubes':{}, 'circles':{}}
+    for _ in range(2):
+        for color in colors:
+            put_cube(rng, game, tokens, color)
+    latencies=[]
+    for turn in range(max_turns):
+        color=colors[turn%p]
+        spec={'order':game['order'], 'flips':game['flips'], 'buildings':game['buildings'], 'cubes':tokens['cubes'],
+              'circles':tokens['circles'], 'players':p, 'clue':game['clues'][color], 'color':color, 'colors':colors}
+        t=time.perf_counter()
+        result=solve_board(spec, worker_state['connectivity'], worker_state['table'])
+        latencies.append(time.perf_counter()-t)
+        cells=[cell for cell, n in result['assignments'].items() if n]
+        if len(cells)==1:
+            if cells[0]==game['cell']:
+                return {'seed':seed, 'turns':turn+1, 'winner':color, 'latencies':latencies}
+            #a wrong search is stopped by the first opponent whose clue does not hold the cell, with a cube
+            opp=[opp for opp in colors[turn%p+1:]+colors[:turn%p] if not game['ens'][game['clues'][opp]]>>(cells[0]-1)&1][0]
+            tokens['cubes'][cells[0]]=opp
+            continue
+        #first question on a cell without any token, else any opponent about a candidate
+        questions=[(cell, opp) for gain, cell, opp in result['recommendations'] if cell not in tokens['cubes'] and cell not in tokens['circles']]
+        if not questions:
+            free=[cell for cell in (cells or result['candidates']) if cell not in tokens['cubes'] and cell not in tokens['circles']]
+            if not free:
+                continue
+            questions=[(rng.choice(free), rng.choice([opp for opp in colors if opp!=color]))]
+        cell, opp=questions[0]
+        if game['ens'][game['clues'][opp]]>>(cell-1)&1:
+            tokens['circles'][cell]=opp
+        else:
+            tokens['cubes'][cell]=opp
+            put_cube(rng, game, tokens, color)
+    return {'seed':seed, 'turns':None, 'winner':None, 'latencies':latencies}
+
+def play_many(seeds, p, workers):
+    with ProcessPoolExecutor(workers, initializer=init_worker) as pool:
+        return list(pool.map(play, seeds, [p]*len(seeds)))
+
+def report(games):
+    won=[game['turns'] for game in games if game['turns'] is not None]
+    print('%d games, %d won' % (len(games), len(won)))
+    if won:
+        print('turns to win: mean %.1f  median %.1f  min %d  max %d' % (statistics.mean(won), statistics.median(won), min(won), max(won)))
+    longest=max(len(game['latencies']) for game in games)
+    print('turn  games  solve_board ms (mean, max)')
+    for turn in range(longest):
+        times=[1000*game['latencies'][turn] for game in games if len(game['latencies'])>turn]
+        print('%4d  %5d  %8.2f %8.2f' % (turn+1, len(times), statistics.mean(times), max(times)))
+
+if __name__ == "__main__":
+    parser=argparse.ArgumentParser(description='Bots playing whole games with solve_board')
+    parser.add_argument('--games', type=int, default=100, help='number of games')
+    parser.add_argument('--players', type=int, default=3, help='players per game, 3 to 5')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes, one per core by default')
+    args=parser.parse_args()
+
+    report(play_many(list(range(args.seed, args.seed+args.games)), args.players, args.workers))